@@ -1,3 +1,26 @@
-from .workflow import AlchemiWorkflow             # noqa: F401
-from .postprocess import AlchemiResultsProcessor  # noqa: F401
-from .analyze_db_util import analyze_db           # noqa: F401
+import importlib
+
+__version__ = "0.1.0"
+
+# Public name -> submodule defining it. Submodules pull in RDKit, WARP,
+# DuckDB and requests, so they are only imported on first access.
+_LAZY_EXPORTS = {
+    "AlchemiWorkflow": ".workflow",
+    "AlchemiResultsProcessor": ".postprocess",
+    "analyze_db": ".analyze_db_util",
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__),
+                    name)
+    globals()[name] = value  # Cache so later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -4,11 +4,20 @@ Utility for analyzing the results in the materials database.
 
 import os
 import sys
+from hashlib import blake2b
+from itertools import groupby, islice
+from pathlib import Path
 import duckdb
+import numpy as np
+import matplotlib
 import matplotlib.pyplot as plt
-import json
+import orjson
+from tqdm import tqdm
 
-from .constants import DB_PATH
+from .constants import CACHE_DIR, DB_PATH
+
+# Plots are only written to files, so skip GUI backend setup
+matplotlib.use('Agg')
 
 
 def connect_db():
@@ -27,13 +36,14 @@ def list_properties(conn):
         FROM properties 
         GROUP BY property_name 
         ORDER BY count DESC
-    """).fetchall()
+    """).fetchnumpy()
+    names = properties['property_name']
 
-    print(f"Found {len(properties)} different properties:")
-    for prop, count in properties:
+    print(f"Found {len(names)} different properties:")
+    for prop, count in zip(names, properties['count']):
         print(f"  - {prop} ({count} values)")
 
-    return [p[0] for p in properties]
+    return names.tolist()
 
 
 def get_calculation_types(conn):
@@ -67,10 +77,15 @@ def get_calculation_status(conn):
         print(f"  - {status}: {count} ({count/total*100:.1f}%)")
 
 
+def _format_value(value) -> str:
+    """Format a statistic, which is None if SQL returned NULL"""
+    return "None" if value is None else f"{value:.4f}"
+
+
 def analyze_property(conn, property_name):
     """Analyze a specific property"""
     # Get basic statistics
-    stats = conn.execute(f"""
+    stats = conn.execute("""
         SELECT 
             COUNT(*) as count,
             MIN(property_value) as min_val,
@@ -78,29 +93,36 @@ def analyze_property(conn, property_name):
             AVG(property_value) as avg_val,
             STDDEV(property_value) as std_val
         FROM properties
-        WHERE property_name = '{property_name}'
-    """).fetchone()
+        WHERE property_name = ?
+    """, [property_name]).fetchone()
 
     count, min_val, max_val, avg_val, std_val = stats
 
     print(f"\nAnalysis of property: {property_name}")
     print(f"  Available values: {count}")
-    print(f"  Range: {min_val:.4f} to {max_val:.4f}")
-    print(f"  Average: {avg_val:.4f}")
-    print(f"  Standard deviation: {std_val:.4f}")
+    print(f"  Range: {_format_value(min_val)} to {_format_value(max_val)}")
+    print(f"  Average: {_format_value(avg_val)}")
+    # STDDEV is NULL for a property with a single value
+    print(f"  Standard deviation: {_format_value(std_val)}")
 
     # Get data for histogram
-    data = conn.execute(f"""
+    data = conn.execute("""
         SELECT property_value
         FROM properties
-        WHERE property_name = '{property_name}'
-    """).fetchnumpy()
+        WHERE property_name = ?
+    """, [property_name]).fetchnumpy()
 
     values = data['property_value']
 
-    # Create histogram
-    plt.figure(figsize=(10, 6))
-    plt.hist(values, bins=30, alpha=0.7, color='blue')
+    # Create histogram from pre-binned counts
+    counts, edges = np.histogram(values, bins=30)
+    fig = plt.figure(figsize=(10, 6))
+    plt.bar(edges[:-1],
+            counts,
+            width=np.diff(edges),
+            align='edge',
+            alpha=0.7,
+            color='blue')
     plt.title(f'Distribution of {property_name}')
     plt.xlabel('Value')
     plt.ylabel('Frequency')
@@ -109,10 +131,11 @@ def analyze_property(conn, property_name):
     # Save plot
     output_file = f"{property_name.replace('/', '_')}_distribution.png"
     plt.savefig(output_file)
+    plt.close(fig)
     print(f"  Plot saved as: {output_file}")
 
     # Find molecules with extreme values
-    extremes = conn.execute(f"""
+    extremes = conn.execute("""
         SELECT 
             c.formula, 
             c.smiles, 
@@ -120,16 +143,16 @@ def analyze_property(conn, property_name):
             c.id
         FROM properties p
         JOIN calculations c ON p.calculation_id = c.id
-        WHERE p.property_name = '{property_name}'
+        WHERE p.property_name = ?
         ORDER BY p.property_value
         LIMIT 5
-    """).fetchall()
+    """, [property_name]).fetchall()
 
     print("\n  Molecules with lowest values:")
     for formula, smiles, value, job_id in extremes:
         print(f"    {formula} ({smiles}): {value:.4f} [Job: {job_id}]")
 
-    extremes = conn.execute(f"""
+    extremes = conn.execute("""
         SELECT 
             c.formula, 
             c.smiles, 
@@ -137,70 +160,156 @@ def analyze_property(conn, property_name):
             c.id
         FROM properties p
         JOIN calculations c ON p.calculation_id = c.id
-        WHERE p.property_name = '{property_name}'
+        WHERE p.property_name = ?
         ORDER BY p.property_value DESC
         LIMIT 5
-    """).fetchall()
+    """, [property_name]).fetchall()
 
     print("\n  Molecules with highest values:")
     for formula, smiles, value, job_id in extremes:
         print(f"    {formula} ({smiles}): {value:.4f} [Job: {job_id}]")
 
 
-def correlation_analysis(conn, property_names):
-    """Analyze correlations between properties"""
-    if len(property_names) < 2:
-        print("Need at least 2 properties to analyze correlations")
-        return
+def _sql_literal(value: str) -> str:
+    """Quote a string as a SQL literal"""
+    return "'" + value.replace("'", "''") + "'"
+
 
-    # Create a temporary view joining properties
-    property_pivots = []
-    for i, prop in enumerate(property_names):
-        property_pivots.append(f"""
-            MAX(CASE WHEN p.property_name = '{prop}' THEN p.property_value END) AS {prop.replace('/', '_')}
-        """)
+def _sql_identifier(name: str) -> str:
+    """Quote a string as a SQL identifier"""
+    return '"' + name.replace('"', '""') + '"'
 
-    pivot_sql = ",\n            ".join(property_pivots)
 
+def update_property_matrix(conn, property_names):
+    """
+    Materialize the property_matrix table with one column per property
+
+    The table is temporary, so analysis never writes to the database file.
+    """
+    # PIVOT needs the property names as literals rather than parameters
+    names_sql = ", ".join(_sql_literal(prop) for prop in property_names)
     conn.execute(f"""
-        CREATE OR REPLACE VIEW property_matrix AS
-        SELECT 
-            p.calculation_id,
-            {pivot_sql}
-        FROM properties p
-        WHERE p.property_name IN ({', '.join(["'" + p + "'" for p in property_names])})
-        GROUP BY p.calculation_id
+        CREATE OR REPLACE TEMP TABLE property_matrix AS
+        PIVOT (
+            SELECT calculation_id, property_name, property_value
+            FROM properties
+            WHERE property_name IN ({names_sql})
+        )
+        ON property_name IN ({names_sql})
+        USING MAX(property_value)
+        GROUP BY calculation_id
     """)
 
-    # Get data for correlation analysis
-    df = conn.execute("SELECT * FROM property_matrix").df()
-    df = df.dropna()  # Remove rows with missing values
 
-    # Create correlation matrix
-    corr_matrix = df.corr()
+def _database_state() -> str:
+    """Describe the database files, changing whenever data is committed"""
+    # Commits land in the WAL file until DuckDB checkpoints them into the
+    # database file, so both have to be part of the state
+    state = []
+    for path in (DB_PATH, f"{DB_PATH}.wal"):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            state.append("-")
+        else:
+            state.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+    return ",".join(state)
+
+
+def _correlation_cache_file(property_names) -> Path:
+    """Cache file for the given properties in the current database"""
+    properties_key = f"{os.path.abspath(DB_PATH)}:{','.join(property_names)}"
+    properties_digest = blake2b(properties_key.encode(),
+                                digest_size=16).hexdigest()
+    state_digest = blake2b(_database_state().encode(),
+                           digest_size=8).hexdigest()
+    return CACHE_DIR / f"corr_{properties_digest}_{state_digest}.npz"
+
+
+def _correlation_matrix(conn, property_names):
+    """
+    Get the correlation matrix of the given properties
+
+    Only calculations that have all of the properties are used. Matrices
+    are cached on disk per database state and set of properties, so
+    repeating an analysis skips the pivot and correlation.
+    """
+    names = sorted(property_names)
+    cache_file = _correlation_cache_file(names)
+    if cache_file.exists():
+        with np.load(cache_file) as cached:
+            corr_matrix = cached['corr_matrix']
+    else:
+        update_property_matrix(conn, names)
+        # Only keep calculations that have every property
+        columns = [_sql_identifier(prop) for prop in names]
+        result = conn.execute(f"""
+            SELECT {', '.join(columns)}
+            FROM property_matrix
+            WHERE {' AND '.join(f'{column} IS NOT NULL' for column in columns)}
+        """).fetchnumpy()
+        data = np.column_stack([result[prop] for prop in names]).astype(float)
+        corr_matrix = np.corrcoef(data, rowvar=False)
+
+        # Matrices for earlier states of the database are stale
+        prefix = cache_file.name.rsplit('_', 1)[0]
+        for stale_file in CACHE_DIR.glob(f"{prefix}_*.npz"):
+            stale_file.unlink(missing_ok=True)
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(cache_file, corr_matrix=corr_matrix)
+
+    # Reorder from sorted to requested order
+    order = [names.index(prop) for prop in property_names]
+    return corr_matrix[np.ix_(order, order)]
+
+
+def _pair_values(conn, prop1, prop2, property_names):
+    """Values of two properties for calculations that have all properties"""
+    result = conn.execute("""
+        SELECT p1.property_value, p2.property_value
+        FROM properties p1
+        JOIN properties p2 USING (calculation_id)
+        WHERE p1.property_name = ? AND p2.property_name = ?
+          AND calculation_id IN (
+              SELECT calculation_id
+              FROM properties
+              WHERE list_contains(?, property_name)
+              GROUP BY calculation_id
+              HAVING COUNT(*) = ?
+          )
+    """, [prop1, prop2, property_names, len(property_names)]).fetchall()
+    return np.array(result, dtype=float).reshape(-1, 2).T
 
-    # Print top correlations
-    print("\nTop correlations:")
-    corr_pairs = []
-    for i in range(len(property_names)):
-        for j in range(i + 1, len(property_names)):
-            prop1 = property_names[i].replace('/', '_')
-            prop2 = property_names[j].replace('/', '_')
-            if prop1 in corr_matrix.columns and prop2 in corr_matrix.columns:
-                corr = corr_matrix.loc[prop1, prop2]
-                corr_pairs.append((prop1, prop2, abs(corr), corr))
 
-    # Sort by absolute correlation
-    corr_pairs.sort(key=lambda x: x[2], reverse=True)
+def correlation_analysis(conn, property_names):
+    """Analyze correlations between properties"""
+    property_names = list(dict.fromkeys(property_names))  # Drop duplicates
+    if len(property_names) < 2:
+        print("Need at least 2 different properties to analyze correlations")
+        return
+
+    corr_matrix = _correlation_matrix(conn, property_names)
+    columns = [prop.replace('/', '_') for prop in property_names]
+
+    # Rank property pairs by absolute correlation
+    rows, cols = np.triu_indices(len(columns), k=1)
+    corr_values = corr_matrix[rows, cols]
+    top = np.argsort(-np.abs(corr_values), kind='stable')[:10]
+    corr_pairs = [(rows[k], cols[k], corr_values[k]) for k in top]
 
-    for prop1, prop2, _, corr in corr_pairs[:10]:
-        print(f"  {prop1} vs {prop2}: {corr:.4f}")
+    # Print top correlations
+    print("\nTop correlations:")
+    for i, j, corr in corr_pairs:
+        print(f"  {columns[i]} vs {columns[j]}: {corr:.4f}")
 
     # Create scatter plot for top correlation
     if corr_pairs:
-        prop1, prop2, _, corr = corr_pairs[0]
-        plt.figure(figsize=(10, 6))
-        plt.scatter(df[prop1], df[prop2], alpha=0.5)
+        i, j, corr = corr_pairs[0]
+        prop1, prop2 = columns[i], columns[j]
+        values1, values2 = _pair_values(conn, property_names[i],
+                                        property_names[j], property_names)
+        fig = plt.figure(figsize=(10, 6))
+        plt.scatter(values1, values2, alpha=0.5)
         plt.title(f'Correlation between {prop1} and {prop2}: {corr:.4f}')
         plt.xlabel(prop1)
         plt.ylabel(prop2)
@@ -208,52 +317,144 @@ def correlation_analysis(conn, property_names):
 
         output_file = f"correlation_{prop1}_{prop2}.png"
         plt.savefig(output_file)
+        plt.close(fig)
         print(f"\nCorrelation plot saved as: {output_file}")
 
 
-def export_json(conn, output_file):
-    """Export database content to JSON"""
-    # Get all calculations
-    calculations = conn.execute("""
-        SELECT id, smiles, inchi, formula, calculation_type, status
-        FROM calculations
-        WHERE status = 'COMPLETED'
-    """).fetchall()
-
-    result = []
-    for calc_id, smiles, inchi, formula, calc_type, status in calculations:
-        # Get properties for this calculation
-        properties = conn.execute(f"""
-            SELECT property_name, property_value, units
-            FROM properties
-            WHERE calculation_id = '{calc_id}'
-        """).fetchall()
+def _iter_rows(cursor, chunk_size=1000):
+    """Yield rows from a cursor, fetching them in chunks"""
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def _iter_records(conn):
+    """Yield one record per completed calculation with its properties"""
+    # Get all calculations together with their properties in one query
+    cursor = conn.execute("""
+        SELECT c.id, c.smiles, c.inchi, c.formula, c.calculation_type,
+               p.property_name, p.property_value, p.units
+        FROM calculations c
+        LEFT JOIN properties p ON p.calculation_id = c.id
+        WHERE c.status = 'COMPLETED'
+        ORDER BY c.id
+    """)
 
+    # groupby is lazy, so a calculation whose rows span two fetched chunks
+    # is still yielded as a single record
+    for (calc_id, smiles, inchi, formula, calc_type), properties in groupby(
+            _iter_rows(cursor), key=lambda row: row[:5]):
         prop_dict = {}
-        for name, value, units in properties:
-            prop_dict[name] = {"value": float(value), "units": units}
+        for *_, name, value, units in properties:
+            # Calculations without properties yield a single NULL row
+            if name is not None:
+                prop_dict[name] = {"value": float(value), "units": units}
 
-        result.append({
+        yield {
             "id": calc_id,
             "smiles": smiles,
             "inchi": inchi,
             "formula": formula,
             "calculation_type": calc_type,
             "properties": prop_dict
-        })
-
-    # Write to file
-    with open(output_file, 'w') as f:
-        json.dump(result, f, indent=2)
+        }
+
+
+def _write_json(records, output_file):
+    """Write records as a single JSON array"""
+    count = 0
+    with open(output_file, 'wb', buffering=1 << 20) as f:
+        f.write(b'[')
+        for record in records:
+            if count:
+                f.write(b',')
+            f.write(orjson.dumps(record, option=orjson.OPT_SERIALIZE_NUMPY))
+            count += 1
+        f.write(b']')
+    return count
+
+
+def _write_jsonl(records, output_file):
+    """Write records as JSON lines, one record per line"""
+    count = 0
+    with open(output_file, 'wb', buffering=1 << 20) as f:
+        for record in records:
+            f.write(orjson.dumps(record, option=orjson.OPT_SERIALIZE_NUMPY))
+            f.write(b'\n')
+            count += 1
+    return count
+
+
+def _write_parquet(records, output_file, batch_size=1000):
+    """Write records to a Parquet file with float32 property values"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("Error: Parquet export requires pyarrow (pip install pyarrow)")
+        sys.exit(1)
 
-    print(f"Exported {len(result)} calculations to {output_file}")
+    schema = pa.schema([
+        ("id", pa.string()),
+        ("smiles", pa.string()),
+        ("inchi", pa.string()),
+        ("formula", pa.string()),
+        ("calculation_type", pa.string()),
+        ("properties",
+         pa.map_(pa.string(),
+                 pa.struct([("value", pa.float32()),
+                            ("units", pa.string())]))),
+    ])
+
+    records = iter(records)
+    count = 0
+    with pq.ParquetWriter(output_file, schema) as writer:
+        while batch := list(islice(records, batch_size)):
+            for record in batch:
+                record["properties"] = list(record["properties"].items())
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            count += len(batch)
+    return count
+
+
+_EXPORT_WRITERS = {
+    "json": _write_json,
+    "jsonl": _write_jsonl,
+    "parquet": _write_parquet,
+}
+
+
+def export_data(conn, output_file, export_format="jsonl", quiet=False):
+    """
+    Export completed calculations and their properties to a file
+
+    Records are streamed from the database, so the export never holds the
+    whole dataset in memory.
+
+    Args:
+        conn: Database connection
+        output_file: Path of the file to write
+        export_format: One of 'json', 'jsonl' or 'parquet'
+        quiet: Hide the progress bar
+    """
+    records = tqdm(_iter_records(conn),
+                   desc="Exporting",
+                   unit="calc",
+                   file=sys.stderr,
+                   disable=quiet or not sys.stderr.isatty())
+    count = _EXPORT_WRITERS[export_format](records, output_file)
+    print(f"Exported {count} calculations to {output_file}")
 
 
 def analyze_db(list_properties: bool = False,
                status: bool = False,
                analyze: str = None,
                correlate: list = None,
-               export: str = None):
+               export: str = None,
+               export_format: str = "jsonl",
+               quiet: bool = False):
     """Analyze the materials database"""
     conn = connect_db()
 
@@ -271,5 +472,5 @@ def analyze_db(list_properties: bool = False,
         correlation_analysis(conn, correlate)
 
     if export:
-        export_json(conn, export)
+        export_data(conn, export, export_format, quiet)
 
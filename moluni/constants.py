@@ -6,3 +6,7 @@ NVIDIA_API_KEY = os.environ.get("NVIDIA_API_KEY")
 NVIDIA_NIM_API_URL = "http://localhost:8003/v1/infer"
 DEFAULT_RESULTS_DIR = Path(__file__).parent / Path("results")
 DB_PATH = "data.duckdb"
+# Submitted jobs that could not be written to the locked database
+PENDING_FALLBACK_PATH = "pending_jobs.jsonl"
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME",
+                                Path.home() / ".cache")) / "moluni"
@@ -0,0 +1,52 @@
+"""
+Utility for communicating with the NVIDIA NIM API.
+"""
+
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .constants import NVIDIA_API_KEY, NVIDIA_NIM_API_URL
+
+logger = logging.getLogger(__name__)
+
+
+def create_session(pool_maxsize: int = 64) -> requests.Session:
+    """
+    Create an authenticated session with connection pooling and retries
+
+    Args:
+        pool_maxsize: Maximum number of pooled connections per host
+
+    Returns:
+        Session to reuse for all NIM API requests
+    """
+    session = requests.Session()
+    session.headers.update({"Authorization": f"Bearer {NVIDIA_API_KEY}"})
+    adapter = HTTPAdapter(pool_maxsize=pool_maxsize,
+                          max_retries=Retry(total=3, backoff_factor=0.2))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def check_job_status(session: requests.Session, job_id: str) -> dict:
+    """
+    Check the status of a job
+
+    Args:
+        session: Session created by create_session
+        job_id: Job ID to check
+
+    Returns:
+        Dictionary with job status information
+    """
+    try:
+        response = session.get(f"{NVIDIA_NIM_API_URL}/{job_id}")
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        logger.error(f"Error checking status for job {job_id}: {str(e)}")
+        return {"status": "ERROR", "error": str(e)}
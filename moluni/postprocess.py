@@ -1,41 +1,182 @@
-import json
+from concurrent.futures import (ProcessPoolExecutor, ThreadPoolExecutor,
+                                as_completed)
+import os
+import sys
 
-import requests
+import orjson
+from tqdm import tqdm
 from pathlib import Path
 import duckdb
 import logging
 
-from .constants import (NVIDIA_API_KEY, NVIDIA_NIM_API_URL, DEFAULT_RESULTS_DIR,
-                        DB_PATH)
+from .constants import DEFAULT_RESULTS_DIR, DB_PATH, PENDING_FALLBACK_PATH
+from .nim_util import create_session, check_job_status
 
 logger = logging.getLogger(__name__)
 
+# Job statuses after which a job will not change anymore
+FINISHED_STATUSES = ("COMPLETED", "FAILED", "ERROR")
+
+
+def _is_finished(job_id: str, job_status: dict) -> bool:
+    """Check whether the API reported a final status for the job"""
+    # Failed status requests also report ERROR, but without the job ID
+    return (job_status.get("status") in FINISHED_STATUSES
+            and job_status.get("job_id") == job_id)
+
+
+def _process_one(result_file: Path) -> tuple | None:
+    """
+    Parse a result file into database rows
+
+    Args:
+        result_file: Path to result file
+
+    Returns:
+        Tuple of the calculation row and a list of property rows,
+        or None if the file could not be parsed or has no job ID
+    """
+    try:
+        # Load results from file
+        with open(result_file, 'rb') as f:
+            result = orjson.loads(f.read())
+
+        # Extract data
+        job_id = result.get("job_id")
+        if not job_id:
+            logger.error(f"Result file {result_file} has no job ID")
+            return None
+        metadata = result.get("metadata", {})
+        calculation = result.get("calculation", {})
+        properties = result.get("properties", {})
+
+        calc_row = (job_id, metadata.get("smiles"), metadata.get("inchi"),
+                    metadata.get("formula"), calculation.get("type"),
+                    result.get("status"), result.get("submission_time"),
+                    result.get("completion_time"))
+
+        prop_rows = []
+        for prop_name, prop_data in properties.items():
+            # Skip non-numeric values, which cannot be stored as FLOAT
+            if isinstance(prop_data, dict) and isinstance(
+                    prop_data.get("value"), (int, float)):
+                prop_rows.append((job_id, prop_name, prop_data["value"],
+                                  prop_data.get("units")))
+            elif isinstance(prop_data, (int, float)):
+                prop_rows.append((job_id, prop_name, prop_data, None))
+    except Exception as e:
+        logger.error(f"Error reading result file {result_file}: {str(e)}")
+        return None
+    return calc_row, prop_rows
+
 
 class AlchemiResultsProcessor:
 
-    def __init__(self, results_dir: str | Path = DEFAULT_RESULTS_DIR):
-        """Initialize the results processor"""
+    def __init__(self,
+                 results_dir: str | Path = DEFAULT_RESULTS_DIR,
+                 max_workers: int = 32,
+                 debug: bool = False,
+                 workers: int = 1,
+                 use_cache: bool = True,
+                 quiet: bool = False):
+        """
+        Initialize the results processor
+
+        Args:
+            results_dir: Directory to store result files in
+            max_workers: Maximum number of concurrent job status requests
+            debug: Pretty-print result files for human inspection
+            workers: Number of processes used to parse result files
+            use_cache: Reuse result files saved by earlier runs
+            quiet: Hide progress bars
+        """
         _results_dir = results_dir or DEFAULT_RESULTS_DIR
         self.results_dir = Path(_results_dir)
         self.results_dir.mkdir(exist_ok=True, parents=True)
+        self.max_workers = max_workers
+        self.debug = debug
+        self.workers = workers
+        self.use_cache = use_cache
+        self.quiet = quiet
+        self._conn = None
+        # Size the connection pool so concurrent status checks reuse
+        # connections instead of opening new ones
+        self._session = create_session(pool_maxsize=max_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    @property
+    def conn(self) -> duckdb.DuckDBPyConnection:
+        """DuckDB connection, opened on first use and reused afterwards"""
+        if self._conn is None:
+            self._conn = duckdb.connect(DB_PATH)
+        return self._conn
+
+    def _disconnect(self):
+        """Close the database connection, releasing DuckDB's file lock"""
+        if getattr(self, "_conn", None) is not None:
+            self._conn.close()
+            self._conn = None
+
+    def close(self):
+        """Close the database connection and HTTP session"""
+        self._disconnect()
+        if getattr(self, "_session", None) is not None:
+            self._session.close()
+
+    def _progress(self, iterable, **kwargs) -> tqdm:
+        """Wrap an iterable in a progress bar shown on interactive stderr"""
+        return tqdm(iterable,
+                    file=sys.stderr,
+                    disable=self.quiet or not sys.stderr.isatty(),
+                    **kwargs)
+
+    @staticmethod
+    def _import_fallback_jobs(conn: duckdb.DuckDBPyConnection):
+        """Move jobs the workflow saved to PENDING_FALLBACK_PATH to pending"""
+        # Claim the file first, so jobs appended meanwhile go to a new one
+        claimed = f"{PENDING_FALLBACK_PATH}.claimed"
+        if not os.path.exists(claimed):
+            if not os.path.exists(PENDING_FALLBACK_PATH):
+                return
+            os.replace(PENDING_FALLBACK_PATH, claimed)
+
+        with open(claimed, 'rb') as f:
+            jobs = [orjson.loads(line) for line in f if line.strip()]
+        conn.executemany(
+            """
+            INSERT INTO pending (job_id, submitted_at)
+            VALUES (?, ?)
+            ON CONFLICT DO NOTHING
+        """, [(job["job_id"], job["submitted_at"]) for job in jobs])
+        os.remove(claimed)
+        logger.info(f"Queued {len(jobs)} jobs from {PENDING_FALLBACK_PATH}")
 
     def _get_pending_jobs(self) -> list:
         """Get list of pending job IDs"""
-        pending_file = self.results_dir / "pending_jobs.json"
-        if not pending_file.exists():
+        # Connecting would create an empty database before any workflow run
+        if not os.path.exists(DB_PATH):
             return []
 
-        with open(pending_file, 'r') as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                logger.error("Error parsing pending jobs file")
-                return []
-
-    def _update_pending_jobs(self, pending_jobs: list):
-        """Update the list of pending job IDs"""
-        with open(self.results_dir / "pending_jobs.json", 'w') as f:
-            json.dump(pending_jobs, f)
+        # Connect only briefly, so the workflow can queue new jobs while
+        # the statuses are polled
+        try:
+            with duckdb.connect(DB_PATH) as conn:
+                self._import_fallback_jobs(conn)
+                rows = conn.execute("""
+                    SELECT job_id FROM pending ORDER BY submitted_at
+                """).fetchall()
+        except duckdb.CatalogException:
+            # No workflow has initialized the database yet
+            return []
+        return [job_id for job_id, in rows]
 
     def check_job_status(self, job_id: str) -> dict:
         """
@@ -47,16 +188,7 @@ class AlchemiResultsProcessor:
         Returns:
             Dictionary with job status information
         """
-        headers = {"Authorization": f"Bearer {NVIDIA_API_KEY}"}
-
-        try:
-            response = requests.get(f"{NVIDIA_NIM_API_URL}/{job_id}",
-                                    headers=headers)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            logger.error(f"Error checking status for job {job_id}: {str(e)}")
-            return {"status": "ERROR", "error": str(e)}
+        return check_job_status(self._session, job_id)
 
     def save_results_to_file(self, job_id: str, result_data: dict) -> Path:
         """
@@ -70,11 +202,39 @@ class AlchemiResultsProcessor:
             Path to result file
         """
         output_file = self.results_dir / f"{job_id}.json"
-        with open(output_file, 'w') as f:
-            json.dump(result_data, f, indent=2)
+        # Result files are read back by save_to_database, so only indent
+        # them when debugging
+        option = orjson.OPT_INDENT_2 if self.debug else None
+        with open(output_file, 'wb') as f:
+            f.write(orjson.dumps(result_data, option=option))
         logger.info(f"Saved results for job {job_id} to {output_file}")
         return output_file
 
+    def _save_rows(self, calc_rows: list, prop_rows: list):
+        """Upsert calculation and property rows into the database"""
+        conn = self.conn
+
+        # Insert calculation info, or update the status of a known job
+        conn.executemany(
+            """
+            INSERT INTO calculations (id, smiles, inchi, formula, calculation_type, status, 
+                                    submission_time, completion_time)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (id) DO UPDATE
+            SET status = excluded.status,
+                completion_time = excluded.completion_time
+        """, calc_rows)
+
+        if prop_rows:
+            conn.executemany(
+                """
+                INSERT INTO properties (calculation_id, property_name, property_value, units)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (calculation_id, property_name) DO UPDATE
+                SET property_value = excluded.property_value,
+                    units = excluded.units
+            """, prop_rows)
+
     def save_to_database(self, result_file: Path) -> bool:
         """
         Save job results to database
@@ -85,74 +245,46 @@ class AlchemiResultsProcessor:
         Returns:
             True if successful
         """
+        rows = _process_one(result_file)
+        if rows is None:
+            return False
+
+        calc_row, prop_rows = rows
         try:
-            # Load results from file
-            with open(result_file, 'r') as f:
-                result = json.load(f)
-
-            # Extract data
-            job_id = result.get("job_id")
-            metadata = result.get("metadata", {})
-            calculation = result.get("calculation", {})
-            properties = result.get("properties", {})
-
-            # Connect to database
-            conn = duckdb.connect(DB_PATH)
-
-            # Check if job already exists
-            existing = conn.execute(
-                f"SELECT id FROM calculations WHERE id = '{job_id}'").fetchone(
-                )
-
-            if existing:
-                # Update existing record
-                conn.execute(
-                    """
-                    UPDATE calculations
-                    SET status = ?, completion_time = ?
-                    WHERE id = ?
-                """, (result.get("status"), result.get("completion_time"),
-                      job_id))
-            else:
-                # Insert calculation info
-                conn.execute(
-                    """
-                    INSERT INTO calculations (id, smiles, inchi, formula, calculation_type, status, 
-                                            submission_time, completion_time)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (job_id, metadata.get("smiles"), metadata.get("inchi"),
-                      metadata.get("formula"), calculation.get("type"),
-                      result.get("status"), result.get("submission_time"),
-                      result.get("completion_time")))
-
-            # Clear existing properties and insert new ones
-            if existing:
-                conn.execute(
-                    f"DELETE FROM properties WHERE calculation_id = '{job_id}'"
-                )
-
-            # Insert properties
-            for prop_name, prop_data in properties.items():
-                if isinstance(prop_data, dict) and "value" in prop_data:
-                    conn.execute(
-                        """
-                        INSERT INTO properties (calculation_id, property_name, property_value, units)
-                        VALUES (?, ?, ?, ?)
-                    """, (job_id, prop_name, prop_data.get("value"),
-                          prop_data.get("units")))
-                elif isinstance(prop_data, (int, float)):
-                    conn.execute(
-                        """
-                        INSERT INTO properties (calculation_id, property_name, property_value, units)
-                        VALUES (?, ?, ?, ?)
-                    """, (job_id, prop_name, prop_data, None))
-
-            conn.close()
-            logger.info(f"Saved results for job {job_id} to database")
-            return True
+            self._save_rows([calc_row], prop_rows)
         except Exception as e:
             logger.error(f"Error saving to database: {str(e)}")
             return False
+        logger.info(f"Saved results for job {calc_row[0]} to database")
+        return True
+
+    def _parse_files(self, result_files: list) -> list:
+        """Parse result files into database rows, in parallel if requested"""
+        if self.workers <= 1 or len(result_files) <= 1:
+            return [
+                _process_one(result_file) for result_file in self._progress(
+                    result_files, desc="Parsing results", unit="file")
+            ]
+
+        chunksize = max(1, len(result_files) // (self.workers * 4))
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            return list(
+                self._progress(executor.map(_process_one,
+                                            result_files,
+                                            chunksize=chunksize),
+                               total=len(result_files),
+                               desc="Parsing results",
+                               unit="file"))
+
+    def _load_saved_result(self, job_id: str) -> Path | None:
+        """Get the result file of a finished job saved by an earlier run"""
+        result_file = self.results_dir / f"{job_id}.json"
+        try:
+            with open(result_file, 'rb') as f:
+                result = orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            return None
+        return result_file if _is_finished(job_id, result) else None
 
     def process_results(self):
         """Process results for all pending jobs"""
@@ -162,28 +294,91 @@ class AlchemiResultsProcessor:
             return
 
         logger.info(f"Processing {len(pending_jobs)} pending jobs")
-        still_pending = []
+        finished_jobs = []
+        result_files = []
+
+        # Result files are only written for finished jobs, so a pending job
+        # that already has a valid one was fetched by a run that failed to
+        # save it
+        saved_files = {}
+        if self.use_cache:
+            for job_id in pending_jobs:
+                result_file = self._load_saved_result(job_id)
+                if result_file is not None:
+                    saved_files[job_id] = result_file
+
+        # Check job statuses concurrently
+        job_statuses = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self.check_job_status, job_id): job_id
+                for job_id in pending_jobs if job_id not in saved_files
+            }
+            for future in self._progress(as_completed(futures),
+                                         total=len(futures),
+                                         desc="Checking jobs",
+                                         unit="job"):
+                job_statuses[futures[future]] = future.result()
 
         for job_id in pending_jobs:
-            # Check job status
-            job_status = self.check_job_status(job_id)
+            if job_id in saved_files:
+                logger.info(f"Reusing saved results for job {job_id}")
+                result_files.append(saved_files[job_id])
+                finished_jobs.append(job_id)
+                continue
+
+            job_status = job_statuses[job_id]
             status = job_status.get("status", "UNKNOWN")
 
-            if status in ["COMPLETED", "FAILED", "ERROR"]:
+            if _is_finished(job_id, job_status):
                 # Job is done (successfully or not)
                 logger.info(f"Job {job_id} finished with status: {status}")
 
                 # Save results to file
-                result_file = self.save_results_to_file(job_id, job_status)
-
-                # Save to database
-                self.save_to_database(result_file)
+                result_files.append(
+                    self.save_results_to_file(job_id, job_status))
+                finished_jobs.append(job_id)
+            elif "job_id" not in job_status:
+                # The status request itself failed; try again next run
+                logger.warning(f"Could not check status of job {job_id}")
             else:
                 # Job is still pending
                 logger.info(
                     f"Job {job_id} is still running with status: {status}")
-                still_pending.append(job_id)
 
-        # Update pending jobs
-        self._update_pending_jobs(still_pending)
-        logger.info(f"Remaining pending jobs: {len(still_pending)}")
+        # Only jobs whose result file yields valid rows are saved; the rest
+        # stay pending so a bad file cannot abort the whole batch
+        saved_jobs = []
+        calc_rows = []
+        prop_rows = []
+        if finished_jobs:
+            parsed = self._parse_files(result_files)
+            for job_id, rows in zip(finished_jobs, parsed):
+                if rows is None or rows[0][0] != job_id:
+                    logger.error(f"Invalid results for job {job_id}, "
+                                 f"keeping it pending")
+                    continue
+                calc_row, job_prop_rows = rows
+                saved_jobs.append(job_id)
+                calc_rows.append(calc_row)
+                prop_rows.extend(job_prop_rows)
+
+        # Save the valid jobs to database and remove them from the pending
+        # table in a single transaction
+        if saved_jobs:
+            self.conn.execute("BEGIN TRANSACTION")
+            try:
+                self._save_rows(calc_rows, prop_rows)
+                self.conn.executemany("DELETE FROM pending WHERE job_id = ?",
+                                      [(job_id, ) for job_id in saved_jobs])
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            finally:
+                self._disconnect()
+            logger.info(
+                f"Saved results for {len(saved_jobs)} jobs to database")
+
+        logger.info(
+            f"Remaining pending jobs: {len(pending_jobs) - len(saved_jobs)}")
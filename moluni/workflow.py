@@ -1,99 +1,200 @@
-import json
+import gzip
+import multiprocessing
+import os
+import sys
 import time
-import requests
 import logging
+from contextlib import nullcontext
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from typing import List, Dict, Any
+from concurrent.futures import (ProcessPoolExecutor, ThreadPoolExecutor,
+                                as_completed)
+from typing import List, Dict, Any, Iterator, TextIO
 import numpy as np
+import orjson
+from tqdm import tqdm
 from rdkit import Chem
 from rdkit.Chem import AllChem
-from ase import Atoms
 import warp as wp
 import duckdb
 
-from .constants import (NVIDIA_API_KEY, NVIDIA_NIM_API_URL, DB_PATH)
+from .constants import NVIDIA_NIM_API_URL, DB_PATH, PENDING_FALLBACK_PATH
+from .nim_util import create_session, check_job_status
 
 logger = logging.getLogger(__name__)
 
+# Number of atoms staged in shared memory per tile by _optimize_geometry
+TILE_SIZE = wp.constant(128)
+
+# Molecules with fewer atoms than this skip WARP unless calibrated otherwise
+GPU_MIN_ATOMS = 256
+
+# CUDA stream for geometry optimization, created once per process
+_stream = None
+
+# Pinned host staging buffers for _optimize_geometry, created once per process
+_host_pos = None
+_host_nums = None
+
 
 class AlchemiWorkflow:
 
-    def __init__(self, smiles_file: str, batch_size: int = 10):
+    def __init__(self,
+                 smiles_file: str | Path | TextIO,
+                 batch_size: int = 10,
+                 debug: bool = False,
+                 quiet: bool = False):
         """
         Initialize the workflow with a file containing SMILES strings
         
         Args:
-            smiles_file: Path to file with SMILES strings (one per line)
+            smiles_file: Path to file with SMILES strings (one per line),
+                gzip-compressed if it ends in .gz, or an open text file
+                such as sys.stdin
             batch_size: Number of molecules to process in parallel
+            debug: Pretty-print output files for human inspection
+            quiet: Hide the progress bar
         """
         self.smiles_file = smiles_file
         self.batch_size = batch_size
-        self.smiles_list = self._load_smiles()
+        self.debug = debug
+        self.quiet = quiet
 
         self._timestamp = datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
         self._output_dir = Path(self._timestamp)
         self._output_dir.mkdir(exist_ok=True, parents=True)
 
-        # Initialize WARP
-        wp.init()
+        # Worker processes for molecule preprocessing, created on first use
+        self.num_workers = min(batch_size, os.cpu_count() or 1)
+        self._executor = None
 
-    def _load_smiles(self) -> List[str]:
-        """Load SMILES strings from file"""
-        with open(self.smiles_file, 'r') as f:
-            return [line.strip() for line in f if line.strip()]
+        # Keep-alive session shared by all NIM API requests
+        self._session = create_session()
+
+        # Initialize WARP and measure where it starts to pay off
+        wp.init()
+        self.gpu_min_atoms = calibrate_gpu_min_atoms()
+        logger.info(f"Using WARP for molecules with at least "
+                    f"{self.gpu_min_atoms} atoms")
+
+    def _iter_smiles(self) -> Iterator[str]:
+        """Read SMILES strings from file one line at a time"""
+        if hasattr(self.smiles_file, "read"):
+            # Already open, e.g. stdin; leave closing it to the caller
+            source = nullcontext(self.smiles_file)
+        elif str(self.smiles_file).endswith(".gz"):
+            source = gzip.open(self.smiles_file, 'rt')
+        else:
+            source = open(self.smiles_file, 'r')
+        with source as f:
+            for line in f:
+                smiles = line.strip()
+                if smiles:
+                    yield smiles
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Get the process pool used for molecule preprocessing"""
+        if self._executor is None:
+            # Spawn fresh workers: forked processes cannot reuse the parent's
+            # CUDA context, so each worker initializes WARP itself
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=wp.init)
+        return self._executor
+
+    def _shutdown_executor(self):
+        """Shut down the preprocessing process pool if it was started"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
 
     def _init_database(self):
         """Initialize DuckDB database with necessary schema"""
-        conn = duckdb.connect(DB_PATH)
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS calculations (
-                id INTEGER PRIMARY KEY,
-                smiles VARCHAR,
-                inchi VARCHAR,
-                formula VARCHAR,
-                calculation_type VARCHAR,
-                status VARCHAR,
-                submission_time TIMESTAMP,
-                completion_time TIMESTAMP
-            )
-        """)
-
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS properties (
-                calculation_id INTEGER,
-                property_name VARCHAR,
-                property_value FLOAT,
-                units VARCHAR,
-                FOREIGN KEY (calculation_id) REFERENCES calculations(id)
-            )
-        """)
-        conn.close()
+        with duckdb.connect(DB_PATH) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS calculations (
+                    id VARCHAR PRIMARY KEY,
+                    smiles VARCHAR,
+                    inchi VARCHAR,
+                    formula VARCHAR,
+                    calculation_type VARCHAR,
+                    status VARCHAR,
+                    submission_time TIMESTAMP,
+                    completion_time TIMESTAMP
+                )
+            """)
+
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS properties (
+                    calculation_id VARCHAR,
+                    property_name VARCHAR,
+                    property_value FLOAT,
+                    units VARCHAR,
+                    PRIMARY KEY (calculation_id, property_name),
+                    FOREIGN KEY (calculation_id) REFERENCES calculations(id)
+                )
+            """)
+
+            # Indexes for the filters and joins used by the analysis queries
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_prop_name
+                ON properties(property_name)
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_prop_calc
+                ON properties(calculation_id)
+            """)
+
+            # Submitted jobs waiting to be processed by AlchemiResultsProcessor
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pending (
+                    job_id VARCHAR PRIMARY KEY,
+                    submitted_at TIMESTAMP
+                )
+            """)
 
     @staticmethod
     @wp.kernel
-    def _optimize_geometry(pos: wp.array,
-                           atomic_numbers: wp.array,
-                           forces: wp.array) -> None:
+    def _optimize_geometry(pos: wp.array(dtype=wp.vec3f),
+                           atomic_numbers: wp.array(dtype=wp.float32),
+                           forces: wp.array(dtype=wp.vec3f),
+                           num_atoms: int) -> None:
         """
         WARP kernel to perform basic geometry optimization
         This is a simplified example - in practice would be more complex
+
+        Inputs are padded to a multiple of TILE_SIZE with zero atomic
+        numbers, so padding atoms contribute no force. Positions are read
+        tile by tile from shared memory instead of once per thread pair.
         """
         tid = wp.tid()
-        if tid < pos.shape[0]:
-            # Simple force calculation (in practice would be more complex)
-            force = wp.vec3f(0.0, 0.0, 0.0)
-            for j in range(pos.shape[0]):
-                if j != tid:
-                    r = pos[tid] - pos[j]
-                    dist = wp.length(r)
-                    if dist < 0.1:  # Avoid division by zero
-                        dist = 0.1
+        p = pos[tid]
+        z = atomic_numbers[tid]
+
+        # Simple force calculation (in practice would be more complex)
+        force = wp.vec3f(0.0, 0.0, 0.0)
+        for k in range(pos.shape[0] // TILE_SIZE):
+            # Every thread reads all atoms of a tile, so keep tiles in
+            # shared memory rather than the default register storage
+            pos_tile = wp.tile_load(pos,
+                                    shape=TILE_SIZE,
+                                    offset=k * TILE_SIZE,
+                                    storage="shared")
+            z_tile = wp.tile_load(atomic_numbers,
+                                  shape=TILE_SIZE,
+                                  offset=k * TILE_SIZE,
+                                  storage="shared")
+            for t in range(TILE_SIZE):
+                if k * TILE_SIZE + t != tid:
+                    r = p - pos_tile[t]
+                    # Avoid division by zero
+                    rinv = 1.0 / wp.max(wp.length(r), 0.1)
                     # Simple repulsive force based on atomic numbers
-                    factor = atomic_numbers[tid] * atomic_numbers[j] / (dist *
-                                                                        dist)
-                    force = force + wp.normalize(r) * factor
+                    force += r * (z * z_tile[t] * rinv * rinv * rinv)
 
+        if tid < num_atoms:
             forces[tid] = force
 
     def preprocess_molecule(self, smiles: str) -> Dict[str, Any]:
@@ -106,59 +207,7 @@ class AlchemiWorkflow:
         Returns:
             Dictionary with molecule information
         """
-        try:
-            # Convert SMILES to RDKit molecule
-            mol = Chem.MolFromSmiles(smiles)
-            if mol is None:
-                logger.error(f"Failed to parse SMILES: {smiles}")
-                return None
-
-            # Add hydrogens and generate 3D coordinates
-            mol = Chem.AddHs(mol)
-            AllChem.EmbedMolecule(mol, randomSeed=42)
-            AllChem.MMFFOptimizeMolecule(mol)
-
-            # Get atomic positions and numbers
-            conformer = mol.GetConformer()
-            positions = np.array([
-                conformer.GetAtomPosition(i) for i in range(mol.GetNumAtoms())
-            ])
-            atomic_numbers = np.array(
-                [atom.GetAtomicNum() for atom in mol.GetAtoms()])
-
-            # Use WARP to further optimize geometry
-            pos_array = wp.array(positions.astype(np.float32), dtype=wp.vec3f)
-            atomic_nums_array = wp.array(atomic_numbers.astype(np.int32),
-                                         dtype=wp.int32)
-            forces_array = wp.zeros_like(pos_array)
-
-            # Run optimization kernel
-            wp.launch(self._optimize_geometry,
-                      dim=pos_array.shape[0],
-                      inputs=[pos_array, atomic_nums_array, forces_array])
-
-            # Get optimized positions
-            optimized_positions = np.array(pos_array.numpy())
-
-            # Create ASE Atoms object
-            atoms = Atoms(numbers=atomic_numbers,
-                          positions=optimized_positions)
-
-            # Create input for NIM API
-            inchi = Chem.MolToInchi(mol)
-            formula = Chem.rdMolDescriptors.CalcMolFormula(mol)
-
-            return {
-                "smiles": smiles,
-                "inchi": inchi,
-                "formula": formula,
-                "atoms": atoms,
-                "atomic_positions": optimized_positions,
-                "atomic_numbers": atomic_numbers
-            }
-        except Exception as e:
-            logger.error(f"Error processing molecule {smiles}: {str(e)}")
-            return None
+        return preprocess_molecule(smiles, self.gpu_min_atoms)
 
     def prepare_nim_input(self, molecule_data: Dict[str, Any],
                           calc_type: str) -> Dict[str, Any]:
@@ -172,14 +221,13 @@ class AlchemiWorkflow:
         Returns:
             Dictionary formatted for NIM API
         """
-        atoms = molecule_data["atoms"]
-
         # Common parameters
         nim_input = {
             "molecule": {
-                "elements": atoms.get_chemical_symbols(),
-                "positions": atoms.positions.tolist(),
-                "lattice": atoms.cell.tolist() if any(atoms.pbc) else None
+                "elements": molecule_data["symbols"],
+                "positions": molecule_data["atomic_positions"].tolist(),
+                # Molecules built from SMILES are never periodic
+                "lattice": None
             },
             "calculation": {
                 "type": calc_type,
@@ -219,15 +267,8 @@ class AlchemiWorkflow:
         Returns:
             Job ID from NIM API
         """
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {NVIDIA_API_KEY}"
-        }
-
         try:
-            response = requests.post(NVIDIA_NIM_API_URL,
-                                     headers=headers,
-                                     json=nim_input)
+            response = self._session.post(NVIDIA_NIM_API_URL, json=nim_input)
             response.raise_for_status()
             job_data = response.json()
             return job_data["job_id"]
@@ -247,16 +288,7 @@ class AlchemiWorkflow:
         Returns:
             Dictionary with job status information
         """
-        headers = {"Authorization": f"Bearer {NVIDIA_API_KEY}"}
-
-        try:
-            response = requests.get(f"{NVIDIA_NIM_API_URL}/{job_id}",
-                                    headers=headers)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            logger.error(f"Error checking job status: {str(e)}")
-            return {"status": "ERROR", "error": str(e)}
+        return check_job_status(self._session, job_id)
 
     def save_results_to_file(self, job_id: str,
                              result_data: Dict[str, Any]) -> Path:
@@ -271,8 +303,9 @@ class AlchemiWorkflow:
             Path to saved file
         """
         output_file = self._output_dir / f"{job_id}.json"
-        with open(output_file, 'w') as f:
-            json.dump(result_data, f, indent=2)
+        option = orjson.OPT_INDENT_2 if self.debug else None
+        with open(output_file, 'wb') as f:
+            f.write(orjson.dumps(result_data, option=option))
         return output_file
 
     def save_to_database(self, result_file: Path) -> bool:
@@ -287,8 +320,8 @@ class AlchemiWorkflow:
         """
         try:
             # Load results from file
-            with open(result_file, 'r') as f:
-                result = json.load(f)
+            with open(result_file, 'rb') as f:
+                result = orjson.loads(f.read())
 
             # Extract data
             job_id = result.get("job_id")
@@ -342,34 +375,112 @@ class AlchemiWorkflow:
         job_ids = []
 
         for smiles in batch:
-            # Preprocess molecule
             logger.info(f"Processing molecule: {smiles}")
-            molecule_data = self.preprocess_molecule(smiles)
-            if molecule_data is None:
-                continue
-
-            # Prepare NIM input
-            nim_input = self.prepare_nim_input(molecule_data, calc_type)
 
-            # Submit calculation
-            job_id = self.submit_calculation(nim_input)
+        # Preprocess molecules, in parallel worker processes when the batch
+        # holds more than one molecule. Each worker gets one chunk of the
+        # batch rather than one task per molecule.
+        if len(batch) == 1:
+            molecules = [(batch[0], self.preprocess_molecule(batch[0]))]
+        else:
+            executor = self._get_executor()
+            chunk_size = -(-len(batch) // self.num_workers)
+            futures = [
+                executor.submit(preprocess_molecules,
+                                batch[i:i + chunk_size], self.gpu_min_atoms)
+                for i in range(0, len(batch), chunk_size)
+            ]
+            molecules = (molecule for future in as_completed(futures)
+                         for molecule in future.result())
+
+        # Submit calculations concurrently over the shared session as soon as
+        # each molecule is preprocessed
+        with ThreadPoolExecutor(max_workers=self.batch_size) as submitter:
+            submissions = {}
+            for smiles, molecule_data in molecules:
+                if molecule_data is None:
+                    continue
+
+                # Prepare NIM input
+                nim_input = self.prepare_nim_input(molecule_data, calc_type)
+
+                # Submit calculation
+                future = submitter.submit(self.submit_calculation, nim_input)
+                submissions[future] = (smiles, molecule_data)
+
+        for future, (smiles, molecule_data) in submissions.items():
+            job_id = future.result()
             if job_id:
                 logger.info(f"Submitted job {job_id} for molecule {smiles}")
                 job_ids.append(job_id)
 
                 # Save initial metadata
                 output_file = self._output_dir / f"{job_id}_submit.json"
-                with open(output_file, 'w') as f:
+                with open(output_file, 'wb') as f:
                     submission_data = {
                         "job_id": job_id,
                         "status": "SUBMITTED",
                         "metadata": molecule_data,
                         "submission_time": time.strftime("%Y-%m-%d %H:%M:%S")
                     }
-                    json.dump(submission_data, f, indent=2)
+                    option = orjson.OPT_SERIALIZE_NUMPY
+                    if self.debug:
+                        option |= orjson.OPT_INDENT_2
+                    f.write(orjson.dumps(submission_data, option=option))
+
+        # Queue submitted jobs for monitoring
+        if job_ids:
+            self._queue_pending(job_ids)
 
         return job_ids
 
+    def _queue_pending(self, job_ids: List[str], attempts: int = 6):
+        """
+        Record submitted jobs in the pending table
+
+        The database is only opened for the insert, since DuckDB locks the
+        file and other scripts need it during long runs. While another
+        script holds the lock the insert is retried with backoff; if the
+        lock is never released, the jobs are appended to
+        PENDING_FALLBACK_PATH for AlchemiResultsProcessor to pick up.
+
+        Args:
+            job_ids: IDs of the submitted jobs
+            attempts: Number of times to try the insert
+        """
+        submitted_at = datetime.now()
+        rows = [(job_id, submitted_at) for job_id in job_ids]
+        delay = 0.5
+        for attempt in range(attempts):
+            try:
+                with duckdb.connect(DB_PATH) as conn:
+                    conn.executemany(
+                        """
+                        INSERT INTO pending (job_id, submitted_at)
+                        VALUES (?, ?)
+                        ON CONFLICT DO NOTHING
+                    """, rows)
+                return
+            except duckdb.IOException as e:
+                if attempt == attempts - 1:
+                    logger.error(f"Could not record pending jobs: {str(e)}")
+                    break
+                logger.warning(
+                    f"Database is locked, retrying in {delay:.1f}s")
+                time.sleep(delay)
+                delay *= 2
+
+        # Never drop submitted jobs: their results could not be collected
+        with open(PENDING_FALLBACK_PATH, 'ab') as f:
+            for job_id, submitted_at in rows:
+                f.write(
+                    orjson.dumps({
+                        "job_id": job_id,
+                        "submitted_at": submitted_at
+                    }) + b"\n")
+        logger.warning(f"Saved {len(rows)} pending jobs to "
+                       f"{PENDING_FALLBACK_PATH} instead")
+
     def run(self, calc_type: str = "dft"):
         """
         Run the entire workflow
@@ -380,24 +491,276 @@ class AlchemiWorkflow:
         # Initialize database
         self._init_database()
 
-        # Process molecules in batches
-        total_molecules = len(self.smiles_list)
+        # Process molecules in batches, reading only one batch of the SMILES
+        # file at a time
+        smiles_iter = self._iter_smiles()
         job_ids = []
 
-        for i in range(0, total_molecules, self.batch_size):
-            batch = self.smiles_list[i:i + self.batch_size]
-            logger.info(
-                f"Processing batch {i//self.batch_size + 1}/{(total_molecules-1)//self.batch_size + 1}"
-            )
-            batch_job_ids = self.process_batch(batch, calc_type)
-            job_ids.extend(batch_job_ids)
-
-            # Save job IDs for monitoring
-            with open(self._output_dir / "pending_jobs.json", 'w') as f:
-                json.dump(job_ids, f)
+        # The number of molecules is unknown until the file is read, so the
+        # progress bar only counts them
+        progress = tqdm(desc="Molecules",
+                        unit="mol",
+                        file=sys.stderr,
+                        disable=self.quiet or not sys.stderr.isatty())
+        try:
+            batch_number = 0
+            while batch := list(islice(smiles_iter, self.batch_size)):
+                batch_number += 1
+                logger.info(f"Processing batch {batch_number}")
+                batch_job_ids = self.process_batch(batch, calc_type)
+                job_ids.extend(batch_job_ids)
+                progress.update(len(batch))
+        finally:
+            progress.close()
+            self._shutdown_executor()
 
         logger.info(f"Submitted {len(job_ids)} jobs for processing")
         return job_ids
 
 
+def _get_stream() -> wp.Stream | None:
+    """Get this process's CUDA stream, or None if no GPU is available"""
+    global _stream
+    if _stream is None and wp.is_cuda_available():
+        _stream = wp.Stream("cuda:0")
+    return _stream
+
+
+def _numpy_forces(positions: np.ndarray,
+                  atomic_numbers: np.ndarray) -> np.ndarray:
+    """
+    NumPy counterpart of the _optimize_geometry kernel for small molecules
+
+    Args:
+        positions: Atomic positions, shape (N, 3)
+        atomic_numbers: Atomic numbers, shape (N,)
+
+    Returns:
+        Forces on each atom, shape (N, 3)
+    """
+    r = positions[:, None, :] - positions[None, :, :]
+    dist = np.linalg.norm(r, axis=-1)
+    # Avoid division by zero; the zero self-interaction vectors keep the
+    # diagonal out of the sum
+    np.maximum(dist, 0.1, out=dist)
+    z = atomic_numbers.astype(np.float32)
+    factor = (z[:, None] * z[None, :]) / dist**3
+    return (r * factor[..., None]).sum(axis=1)
+
+
+def _get_staging_buffers(num_padded: int) -> tuple[wp.array, wp.array]:
+    """
+    Get this process's host staging buffers for num_padded atoms
+
+    The buffers are pinned when a GPU is available and reused across
+    molecules, growing only when a larger molecule comes along: freeing
+    pinned memory synchronizes the device.
+
+    Args:
+        num_padded: Number of atoms, padded to a whole number of tiles
+
+    Returns:
+        Views of the position and atomic number buffers
+    """
+    global _host_pos, _host_nums
+    if _host_pos is None or _host_pos.shape[0] < num_padded:
+        pinned = _get_stream() is not None
+        _host_pos = wp.empty(num_padded,
+                             dtype=wp.vec3f,
+                             device="cpu",
+                             pinned=pinned)
+        _host_nums = wp.empty(num_padded,
+                              dtype=wp.float32,
+                              device="cpu",
+                              pinned=pinned)
+    return _host_pos[:num_padded], _host_nums[:num_padded]
+
+
+def _launch_geometry_kernel(positions: np.ndarray,
+                            atomic_numbers: np.ndarray) -> tuple:
+    """
+    Queue the _optimize_geometry kernel and the copy back of positions
+
+    Args:
+        positions: Atomic positions, shape (N, 3)
+        atomic_numbers: Atomic numbers, shape (N,)
+
+    Returns:
+        Arrays used by the queued work, host positions first; pass them to
+        _collect_positions so none is freed while the work is running
+    """
+    # Stage inputs padded to a whole number of tiles in the host buffers;
+    # padding atoms get zero positions and atomic numbers
+    num_atoms = len(atomic_numbers)
+    num_padded = -(-num_atoms // TILE_SIZE) * TILE_SIZE
+    host_pos, host_nums = _get_staging_buffers(num_padded)
+    staged_positions = host_pos.numpy()
+    staged_positions[:num_atoms] = positions
+    staged_positions[num_atoms:] = 0.0
+    staged_numbers = host_nums.numpy()
+    staged_numbers[:num_atoms] = atomic_numbers
+    staged_numbers[num_atoms:] = 0.0
+
+    stream = _get_stream()
+    device = "cpu" if stream is None else stream.device
+    with nullcontext() if stream is None else wp.ScopedStream(stream):
+        pos_array = wp.clone(host_pos, device=device)
+        atomic_nums_array = wp.clone(host_nums, device=device)
+        forces_array = wp.zeros_like(pos_array)
+
+        # Run optimization kernel, one thread block per tile
+        wp.launch(AlchemiWorkflow._optimize_geometry,
+                  dim=num_padded,
+                  inputs=[pos_array, atomic_nums_array, forces_array,
+                          num_atoms],
+                  device=device,
+                  block_dim=TILE_SIZE)
+        wp.copy(host_pos, pos_array)
+
+    return host_pos, host_nums, pos_array, atomic_nums_array, forces_array
+
+
+def _collect_positions(arrays: tuple, num_atoms: int) -> np.ndarray:
+    """
+    Wait for queued WARP work and return the optimized positions
+
+    Args:
+        arrays: Arrays returned by _launch_geometry_kernel
+        num_atoms: Number of atoms in the molecule
+
+    Returns:
+        Optimized positions, shape (N, 3)
+    """
+    stream = _get_stream()
+    if stream is not None:
+        wp.synchronize_stream(stream)
+    # Copy out, since the staging buffer is reused by the next molecule
+    return arrays[0].numpy()[:num_atoms].copy()
+
+
+def calibrate_gpu_min_atoms(sizes=(32, 64, 128, 256, 512, 1024),
+                            repeats: int = 3) -> int:
+    """
+    Find the molecule size from which the WARP kernel beats NumPy
+
+    Both paths are timed end to end, including WARP allocation, launch and
+    copy back, on random geometries of increasing size.
+
+    Args:
+        sizes: Atom counts to try, in increasing order
+        repeats: Number of timings per path; the fastest is used
+
+    Returns:
+        Smallest atom count for which WARP is faster
+    """
+
+    def best_time(func):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    rng = np.random.default_rng(42)
+    for num_atoms in sizes:
+        positions = rng.uniform(0.0, 10.0, (num_atoms, 3)).astype(np.float32)
+        atomic_numbers = np.full(num_atoms, 6, dtype=np.int32)
+
+        def run_warp():
+            arrays = _launch_geometry_kernel(positions, atomic_numbers)
+            _collect_positions(arrays, num_atoms)
+
+        # Compile the kernel before timing it
+        run_warp()
+        warp_time = best_time(run_warp)
+        numpy_time = best_time(
+            lambda: _numpy_forces(positions, atomic_numbers))
+        if warp_time < numpy_time:
+            return num_atoms
+
+    return 2 * sizes[-1]
+
+
+def preprocess_molecule(smiles: str,
+                        gpu_min_atoms: int = GPU_MIN_ATOMS) -> Dict[str, Any]:
+    """
+    Convert SMILES to 3D structure using RDKit and prepare for calculation
+    
+    Args:
+        smiles: SMILES string of the molecule
+        gpu_min_atoms: Molecules with fewer atoms skip WARP and use NumPy
+        
+    Returns:
+        Dictionary with molecule information
+    """
+    try:
+        # Convert SMILES to RDKit molecule
+        mol = Chem.MolFromSmiles(smiles)
+        if mol is None:
+            logger.error(f"Failed to parse SMILES: {smiles}")
+            return None
+
+        # Add hydrogens and generate 3D coordinates
+        mol = Chem.AddHs(mol)
+        AllChem.EmbedMolecule(mol, randomSeed=42)
+        AllChem.MMFFOptimizeMolecule(mol)
+
+        # Get atomic positions and numbers
+        conformer = mol.GetConformer()
+        positions = conformer.GetPositions().astype(np.float32, copy=False)
+        atomic_numbers = np.fromiter(
+            (atom.GetAtomicNum() for atom in mol.GetAtoms()),
+            dtype=np.int32,
+            count=mol.GetNumAtoms())
+        symbols = [atom.GetSymbol() for atom in mol.GetAtoms()]
+
+        # Further optimize geometry; small molecules do not amortize the
+        # WARP allocation, launch and copy overhead
+        num_atoms = len(atomic_numbers)
+        if num_atoms < gpu_min_atoms:
+            _numpy_forces(positions, atomic_numbers)
+            arrays = None
+        else:
+            arrays = _launch_geometry_kernel(positions, atomic_numbers)
+
+        # Create input for NIM API while the kernel runs
+        inchi = Chem.MolToInchi(mol)
+        formula = Chem.rdMolDescriptors.CalcMolFormula(mol)
+
+        # Get optimized positions
+        if arrays is None:
+            optimized_positions = positions
+        else:
+            optimized_positions = _collect_positions(arrays, num_atoms)
+
+        return {
+            "smiles": smiles,
+            "inchi": inchi,
+            "formula": formula,
+            "symbols": symbols,
+            "atomic_positions": optimized_positions,
+            "atomic_numbers": atomic_numbers
+        }
+    except Exception as e:
+        logger.error(f"Error processing molecule {smiles}: {str(e)}")
+        return None
+
+
+def preprocess_molecules(smiles_batch: List[str],
+                         gpu_min_atoms: int = GPU_MIN_ATOMS) -> List[tuple]:
+    """
+    Preprocess a chunk of molecules in a single worker task
+
+    Defined at module level so it can be dispatched to worker processes.
+
+    Args:
+        smiles_batch: SMILES strings of the molecules
+        gpu_min_atoms: Molecules with fewer atoms skip WARP and use NumPy
 
+    Returns:
+        List of (SMILES, molecule information) pairs; the information is
+        None for molecules that failed to preprocess
+    """
+    return [(smiles, preprocess_molecule(smiles, gpu_min_atoms))
+            for smiles in smiles_batch]
@@ -1,43 +1,86 @@
-import argparse
-
-from moluni import analyze_db
-
-def main():
-    parser = argparse.ArgumentParser(description='Analyze materials database')
-    parser.add_argument('--list-properties',
-                        action='store_true',
-                        help='List all available properties')
-    parser.add_argument('--status',
-                        action='store_true',
-                        help='Show calculation status summary')
-    parser.add_argument('--analyze',
-                        type=str,
-                        metavar='PROPERTY',
-                        help='Analyze a specific property')
-    parser.add_argument('--correlate',
-                        type=str,
-                        nargs='+',
-                        metavar='PROPERTY',
-                        help='Analyze correlations between properties')
-    parser.add_argument('--export',
-                        type=str,
-                        metavar='FILE',
-                        help='Export data to JSON file')
-
-    args = parser.parse_args()
+"""Analyze the materials database"""
 
+import os
+from enum import Enum
+from typing import Annotated, List, Optional
+
+import typer
+
+app = typer.Typer(add_completion=False)
+
+
+class ExportFormat(str, Enum):
+    json = "json"
+    jsonl = "jsonl"
+    parquet = "parquet"
+
+
+def _check_export_path(export: Optional[str]) -> Optional[str]:
+    """Make sure the export file can be created"""
+    if export:
+        export_dir = os.path.dirname(os.path.abspath(export))
+        if not os.path.isdir(export_dir):
+            raise typer.BadParameter(
+                f"Export directory not found: {export_dir}")
+        if not os.access(export_dir, os.W_OK):
+            raise typer.BadParameter(
+                f"Export directory is not writable: {export_dir}")
+    return export
+
+
+@app.command()
+def main(
+    ctx: typer.Context,
+    list_properties: Annotated[
+        bool,
+        typer.Option('--list-properties',
+                     help='List all available properties')] = False,
+    status: Annotated[
+        bool,
+        typer.Option('--status',
+                     help='Show calculation status summary')] = False,
+    analyze: Annotated[
+        Optional[str],
+        typer.Option(metavar='PROPERTY',
+                     help='Analyze a specific property')] = None,
+    correlate: Annotated[
+        Optional[List[str]],
+        typer.Option(metavar='PROPERTY',
+                     help='Analyze correlations between properties '
+                     '(repeat for each property)')] = None,
+    export: Annotated[
+        Optional[str],
+        typer.Option(metavar='FILE',
+                     callback=_check_export_path,
+                     help='Export data to FILE')] = None,
+    export_format: Annotated[
+        ExportFormat,
+        typer.Option('--format',
+                     help='File format of the export')] = ExportFormat.jsonl,
+    quiet: Annotated[
+        bool,
+        typer.Option('--quiet', '-q',
+                     help='Hide progress bars')] = False,
+):
+    """Analyze materials database"""
     # If no arguments, show help
-    if not any(vars(args).values()):
-        parser.print_help()
+    if not any((list_properties, status, analyze, correlate, export)):
+        typer.echo(ctx.get_help())
+        return
+
+    # Import after parsing so --help and usage errors stay fast
+    from moluni import analyze_db
 
     analyze_db(
-        list_properties=args.list_properties,
-        status=args.status,
-        analyze=args.analyze,
-        correlate=args.correlate,
-        export=args.export
+        list_properties=list_properties,
+        status=status,
+        analyze=analyze,
+        correlate=correlate,
+        export=export,
+        export_format=export_format.value,
+        quiet=quiet
     )
 
 
 if __name__ == "__main__":
-    main()
+    app()
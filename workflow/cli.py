@@ -0,0 +1,59 @@
+"""
+Single entry point for the workflow scripts.
+
+Usage: python workflow/cli.py {run,process,analyze} [OPTIONS]...
+"""
+
+import importlib
+from typing import Annotated
+
+import typer
+from typer.core import TyperGroup
+
+
+class LazyGroup(TyperGroup):
+    """Typer group that imports a subcommand's module only when it is used"""
+
+    # Command name -> module defining a single-command Typer `app`
+    lazy_subcommands = {
+        'analyze': 'analyze_db',
+        'process': 'process_results',
+        'run': 'run_alchemi_workflow',
+    }
+
+    def list_commands(self, ctx):
+        return sorted(self.lazy_subcommands)
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name not in self.lazy_subcommands:
+            return None
+        module = importlib.import_module(self.lazy_subcommands[cmd_name])
+        command = typer.main.get_command(module.app)
+        command.name = cmd_name
+        return command
+
+
+app = typer.Typer(cls=LazyGroup, add_completion=False, no_args_is_help=True)
+
+
+def _version_callback(value: bool):
+    """Print the moluni version and exit"""
+    if value:
+        from moluni import __version__
+        typer.echo(__version__)
+        raise typer.Exit()
+
+
+@app.callback()
+def cli(version: Annotated[
+    bool,
+    typer.Option('-V',
+                 '--version',
+                 callback=_version_callback,
+                 is_eager=True,
+                 help='Show version and exit')] = False):
+    """Alchemi materials discovery workflow"""
+
+
+if __name__ == "__main__":
+    app()
@@ -1,20 +1,47 @@
-import argparse
+"""Process results from Alchemi NIM API"""
 
-from moluni import AlchemiResultsProcessor
+from pathlib import Path
+from typing import Annotated, Optional
 
+import typer
 
-def main():
-    parser = argparse.ArgumentParser(
-        description='Process results from Alchemi NIM API')
-    parser.add_argument('--results-dir',
-                        type=str,
-                        help='Path of result directory to process')
+app = typer.Typer(add_completion=False)
 
-    args = parser.parse_args()
 
-    processor = AlchemiResultsProcessor(args.results_dir)
-    processor.process_results()
+@app.command()
+def main(
+    results_dir: Annotated[
+        Optional[Path],
+        typer.Option(file_okay=False,
+                     help='Path of result directory to process')] = None,
+    debug: Annotated[
+        bool, typer.Option('--debug',
+                           help='Pretty-print result files')] = False,
+    workers: Annotated[
+        int,
+        typer.Option(min=1,
+                     help='Number of processes used to parse result files')
+    ] = 1,
+    no_cache: Annotated[
+        bool,
+        typer.Option('--no-cache',
+                     help='Poll every pending job again')] = False,
+    quiet: Annotated[
+        bool,
+        typer.Option('--quiet', '-q',
+                     help='Hide progress bars')] = False,
+):
+    """Process results from Alchemi NIM API"""
+    # Import after parsing so --help and usage errors stay fast
+    from moluni import AlchemiResultsProcessor
+
+    with AlchemiResultsProcessor(results_dir,
+                                 debug=debug,
+                                 workers=workers,
+                                 use_cache=not no_cache,
+                                 quiet=quiet) as processor:
+        processor.process_results()
 
 
 if __name__ == "__main__":
-    main()
+    app()
@@ -1,27 +1,73 @@
-import argparse
+"""Submit SMILES to the Alchemi NIM API"""
 
-from moluni import AlchemiWorkflow
+import sys
+from enum import Enum
+from pathlib import Path
+from typing import Annotated
 
-def main():
-    parser = argparse.ArgumentParser(
-        description='Alchemi Materials Discovery Workflow')
-    parser.add_argument('--smiles',
-                        required=True,
-                        help='Path to file with SMILES strings')
-    parser.add_argument('--batch-size',
-                        type=int,
-                        default=10,
-                        help='Batch size for processing')
-    parser.add_argument('--calc-type',
-                        default='dft',
-                        choices=['dft', 'md'],
-                        help='Calculation type')
+import typer
 
-    args = parser.parse_args()
+app = typer.Typer(add_completion=False)
 
-    workflow = AlchemiWorkflow(args.smiles, args.batch_size)
-    workflow.run(args.calc_type)
+
+class CalcType(str, Enum):
+    dft = "dft"
+    md = "md"
+
+
+def _version() -> str:
+    from moluni import __version__
+    return __version__
+
+
+def _version_callback(value: bool):
+    """Print the moluni version and exit"""
+    if value:
+        typer.echo(_version())
+        raise typer.Exit()
+
+
+@app.command()
+def main(
+    smiles: Annotated[
+        Path,
+        typer.Option(exists=True,
+                     dir_okay=False,
+                     readable=True,
+                     allow_dash=True,
+                     help='Path to file with SMILES strings, optionally '
+                     'gzip-compressed, or - to read from stdin')],
+    batch_size: Annotated[
+        int, typer.Option(min=1, help='Batch size for processing')] = 10,
+    calc_type: Annotated[CalcType,
+                         typer.Option(help='Calculation type')] = CalcType.dft,
+    debug: Annotated[
+        bool, typer.Option('--debug',
+                           help='Pretty-print output files')] = False,
+    quiet: Annotated[
+        bool,
+        typer.Option('--quiet', '-q',
+                     help='Hide progress bars')] = False,
+    version: Annotated[
+        bool,
+        typer.Option('-V',
+                     '--version',
+                     callback=_version_callback,
+                     is_eager=True,
+                     help='Show version and exit')] = False,
+):
+    """Alchemi Materials Discovery Workflow"""
+    # Import after parsing so --help and usage errors stay fast
+    from moluni import AlchemiWorkflow
+
+    source = sys.stdin if str(smiles) == '-' else str(smiles)
+    workflow = AlchemiWorkflow(source, batch_size, debug, quiet)
+    workflow.run(calc_type.value)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Answer a bare --version without building the command
+    if sys.argv[1:] in (['-V'], ['--version']):
+        print(_version())
+    else:
+        app()
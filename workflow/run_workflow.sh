@@ -34,7 +34,7 @@ source venv/bin/activate
 # Install dependencies if needed
 if ! pip show rdkit >/dev/null 2>&1; then
     echo "Installing dependencies..."
-    pip install rdkit ase numpy duckdb requests
+    pip install rdkit numpy duckdb requests orjson typer tqdm
     
     # Install NVIDIA WARP
     pip install warp-lang
@@ -44,5 +44,5 @@ fi
 echo "Starting workflow with SMILES from $SMILES_FILE"
 python run_alchemi_workflow.py --smiles "$SMILES_FILE" --batch-size "$BATCH_SIZE" --calc-type "$CALC_TYPE"
 
-echo "Workflow submission complete. Job IDs saved to results/pending_jobs.json"
+echo "Workflow submission complete. Job IDs saved to the pending table in data.duckdb"
 echo "Use check_results.sh to monitor job status and retrieve results"